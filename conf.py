@@ -1,14 +1,106 @@
 #!/usr/bin/env python3
 import tomllib
 import json
+import http.client
 import urllib.request
+import base64
+import dbm
+import shelve
 import sys
 import os
-from collections import deque, defaultdict
+import re
+import functools
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urljoin, unquote
+
+USER_AGENT = "dep-grapher/1.0"
+HTTP_TIMEOUT = 10
+# Перенаправления, по которым GET-запрос переходит автоматически, как в urlopen
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+MAX_REDIRECTS = 5
+MAX_WORKERS = 8
+# Виды зависимостей crates.io и те, по которым идёт обход по умолчанию
+DEPENDENCY_KINDS = frozenset({'normal', 'build', 'dev'})
+DEFAULT_DEPENDENCY_KINDS = frozenset({'normal'})
+# Абсолютный предел глубины независимо от настройки пользователя
+MAX_DEPTH_LIMIT = 500
+# Оценка размера графа для заранее выделяемых массивов: fanout ** глубина,
+# но не больше PRESIZE_LIMIT пакетов
+ESTIMATED_FANOUT = 8
+PRESIZE_LIMIT = 10_000
+# Минимальный интервал между запросами к хосту, секунды. Политика crates.io
+# для автоматических клиентов — не более 1 запроса в секунду; к остальным
+# хостам (зеркала, локальные репозитории) запросы идут без задержки.
+# Для хостов из этой таблицы параллельная загрузка уровня не ускоряет обход:
+# запросы всё равно выстраиваются с заданным интервалом
+REQUEST_INTERVALS = {'crates.io': 1.0}
+# Кеш ответов репозитория между запусками (ETag / Last-Modified)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dep-grapher")
+
+# Открытые keep-alive соединения по (схема, хост) для каждого потока:
+# TCP+TLS рукопожатие выполняется один раз, а не на каждый запрос
+_local = threading.local()
+
+_rate_lock = threading.Lock()
+_next_request_at = {}   # хост -> время, раньше которого запрос к нему не отправляется
+
+_cache_lock = threading.Lock()
+
+# Разобранные конфигурации: путь -> (mtime_ns, config); неизменённый файл не перечитывается
+_config_cache = {}
 
 class ConfigError(Exception):
     pass
 
+# Запись о зависимости: кортеж без словаря атрибутов, поля доступны по индексу.
+# В дисковых кешах хранятся обычные кортежи, чтобы pickle не зависел от имени модуля
+Dep = namedtuple('Dep', 'name version_req kind')
+
+# Строка файла тестового графа: "ПАКЕТ: ЗАВ1, ЗАВ2"
+_TEST_GRAPH_LINE = re.compile(r'^([^:\n]*):(.*)$', re.MULTILINE)
+
+_REQUIRED = object()
+
+# Схема config.toml: (ключ результата, секция, параметр, тип или кортеж типов, значение по умолчанию)
+_CONFIG_SCHEMA = (
+    ('package_name', 'package', 'name', str, _REQUIRED),
+    ('package_version', 'package', 'version', str, _REQUIRED),
+    ('repository_url', 'repository', 'url', str, _REQUIRED),
+    ('use_test_repository', 'repository', 'use_test_repository', bool, _REQUIRED),
+    ('test_repository_path', 'repository', 'test_repository_path', str, ''),
+    # Глубина — целое число или inf (без ограничения), float проверяется ниже
+    ('max_depth', 'analysis', 'max_depth', (int, float), _REQUIRED),
+    ('stop_on_first_cycle', 'analysis', 'stop_on_first_cycle', bool, False),
+    ('include_kinds', 'analysis', 'include_kinds', list, sorted(DEFAULT_DEPENDENCY_KINDS)),
+)
+
+class DependencyGraph:
+    """Граф зависимостей: пакеты пронумерованы, рёбра хранятся списками номеров"""
+    
+    def __init__(self):
+        self.names = []   # номер -> "package@version"
+        self.id_of = {}   # "package@version" -> номер
+        self.adj = []     # номер -> номера прямых зависимостей
+    
+    def intern(self, package_key):
+        """Номер пакета; новый пакет получает следующий свободный номер"""
+        node = self.id_of.get(package_key)
+        if node is None:
+            node = self.id_of[package_key] = len(self.names)
+            self.names.append(package_key)
+            self.adj.append([])
+        return node
+    
+    def dedup_edges(self):
+        """Удаление повторных рёбер (платформенные варианты одной зависимости)"""
+        adj = self.adj
+        for node, deps in enumerate(adj):
+            if len(deps) > 1:
+                adj[node] = list(dict.fromkeys(deps))
+
 def get_user_input():
     """Интерактивный ввод параметров от пользователя"""
     
@@ -37,8 +129,43 @@ def get_user_input():
     
     return config
 
+def validate_config(config):
+    """Проверка разобранного TOML по схеме за один проход"""
+    result = {}
+    for name, section, key, expected_type, default in _CONFIG_SCHEMA:
+        table = config.get(section)
+        value = table.get(key, default) if isinstance(table, dict) else default
+        if value is _REQUIRED or (value == '' and default is _REQUIRED):
+            raise ConfigError(f"Не задан параметр {section}.{key}")
+        types = expected_type if isinstance(expected_type, tuple) else (expected_type,)
+        # bool — подкласс int, поэтому true/false для глубины отвергаем явно
+        if not isinstance(value, types) or (bool not in types and isinstance(value, bool)):
+            type_names = ' или '.join(t.__name__ for t in types)
+            raise ConfigError(f"Параметр {section}.{key} должен иметь тип {type_names}")
+        result[name] = value
+    
+    max_depth = result['max_depth']
+    if isinstance(max_depth, float) and max_depth != float('inf'):
+        raise ConfigError("Параметр analysis.max_depth должен быть целым числом или inf")
+    if max_depth < 0:
+        raise ConfigError("Параметр analysis.max_depth не может быть отрицательным")
+    kinds = result['include_kinds']
+    if not all(isinstance(kind, str) for kind in kinds) or not DEPENDENCY_KINDS.issuperset(kinds):
+        raise ConfigError(f"Параметр analysis.include_kinds допускает только: {', '.join(sorted(DEPENDENCY_KINDS))}")
+    result['include_kinds'] = frozenset(kinds)
+    return result
+
 def load_config(config_path="config.toml"):
     """Загрузка конфигурации из TOML файла"""
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        raise ConfigError(f"Файл не найден: {config_path}")
+    
+    cached = _config_cache.get(config_path)
+    if cached is not None and cached[0] == mtime_ns:
+        return dict(cached[1])
+    
     try:
         with open(config_path, 'rb') as f:
             config = tomllib.load(f)
@@ -47,30 +174,155 @@ def load_config(config_path="config.toml"):
     except tomllib.TOMLDecodeError as e:
         raise ConfigError(f"Ошибка TOML: {e}")
     
-    return {
-        'package_name': config['package']['name'],
-        'package_version': config['package']['version'],
-        'repository_url': config['repository']['url'],
-        'use_test_repository': config['repository']['use_test_repository'],
-        'test_repository_path': config['repository'].get('test_repository_path', ''),
-        'max_depth': config['analysis']['max_depth']
-    }
+    result = validate_config(config)
+    _config_cache[config_path] = (mtime_ns, result)
+    return dict(result)
+
+def _wait_rate_limit(host):
+    """Ожидание очереди на запрос к хосту, общей для всех потоков"""
+    interval = REQUEST_INTERVALS.get(host)
+    if not interval:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        next_at = _next_request_at.get(host, 0.0)
+        delay = next_at - now
+        _next_request_at[host] = max(now, next_at) + interval
+    if delay > 0:
+        time.sleep(delay)
+
+def _cache_get(url):
+    """Чтение закешированного ответа (etag, last_modified, dependencies)"""
+    try:
+        with _cache_lock, shelve.open(os.path.join(CACHE_DIR, "http")) as db:
+            return db.get(url)
+    except (OSError, *dbm.error):
+        return None
+
+def _cache_put(url, entry):
+    """Сохранение ответа в кеш; ошибки кеша не мешают анализу"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with _cache_lock, shelve.open(os.path.join(CACHE_DIR, "http")) as db:
+            db[url] = entry
+    except (OSError, *dbm.error):
+        pass
+
+def _new_connection(scheme, netloc):
+    """Соединение с хостом напрямую или через прокси из HTTP(S)_PROXY / NO_PROXY
+    
+    Возвращает (conn, proxy_headers). proxy_headers не None только для
+    http-прокси без туннеля: тогда в запросе передаётся полный URL.
+    """
+    connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(netloc):
+        return connection_class(netloc, timeout=HTTP_TIMEOUT), None
+    
+    proxy_parts = urlsplit(proxy if '://' in proxy else f"http://{proxy}")
+    proxy_port = proxy_parts.port or (443 if proxy_parts.scheme == 'https' else 80)
+    proxy_headers = {}
+    if proxy_parts.username:
+        credentials = f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+        proxy_headers['Proxy-Authorization'] = f"Basic {base64.b64encode(credentials.encode()).decode()}"
+    
+    conn = connection_class(proxy_parts.hostname, proxy_port, timeout=HTTP_TIMEOUT)
+    if scheme == 'https':
+        # TLS до целевого хоста идёт внутри CONNECT-туннеля через прокси
+        conn.set_tunnel(netloc, headers=proxy_headers)
+        return conn, None
+    return conn, proxy_headers
+
+def _http_request(url, headers):
+    """Один GET-запрос через переиспользуемое соединение, возвращает (status, headers, body)"""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    path = parts.path or "/"
+    if parts.query:
+        path += f"?{parts.query}"
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    # Вторая попытка нужна только если сервер закрыл простаивающее keep-alive
+    # соединение (в пуле лежат лишь соединения, уже отдавшие ответ). Таймауты
+    # и ошибки нового соединения не повторяются. Каждая попытка — отдельный
+    # запрос к хосту и проходит через ограничитель частоты
+    for _attempt in range(2):
+        _wait_rate_limit(parts.hostname)
+        reused = key in connections
+        if not reused:
+            connections[key] = _new_connection(parts.scheme, parts.netloc)
+        conn, proxy_headers = connections[key]
+        try:
+            if proxy_headers is None:
+                conn.request('GET', path, headers=headers)
+            else:
+                conn.request('GET', url, headers={**headers, **proxy_headers})
+            response = conn.getresponse()
+            return response.status, response.headers, response.read()
+        except (ConnectionResetError, BrokenPipeError):
+            # http.client.RemoteDisconnected — подкласс ConnectionResetError
+            conn.close()
+            connections.pop(key, None)
+            if not reused:
+                raise
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            connections.pop(key, None)
+            raise
 
-def fetch_cargo_dependencies(package_name, version, repository_url):
-    """Получение зависимостей из crates.io API"""
+def _http_get(url, extra_headers=None):
+    """GET-запрос с переходом по перенаправлениям, возвращает (status, headers, body)"""
+    headers = {'User-Agent': USER_AGENT, 'Accept': 'application/json'}
+    if extra_headers:
+        headers.update(extra_headers)
+    
+    for _ in range(MAX_REDIRECTS + 1):
+        status, response_headers, body = _http_request(url, headers)
+        location = response_headers.get('Location')
+        if status not in REDIRECT_STATUSES or not location:
+            return status, response_headers, body
+        url = urljoin(url, location)
+    raise ConfigError(f"Слишком много перенаправлений: {url}")
+
+@functools.lru_cache(maxsize=4096)
+def fetch_cargo_dependencies(package_name, version, repository_url, kinds=DEFAULT_DEPENDENCY_KINDS):
+    """Получение зависимостей из crates.io API (кешируется по аргументам)
+
+    Возвращает неизменяемый кортеж записей Dep, чтобы
+    закешированный результат нельзя было испортить снаружи. Остаются только
+    зависимости видов из kinds; в HTTP-кеше хранится полный список.
+    """
     try:
         url = f"{repository_url}/{package_name}/{version}/dependencies"
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode())
         
-        dependencies = []
-        for dep in data.get('dependencies', []):
-            dependencies.append({
-                'name': dep['crate_id'],
-                'version_req': dep['req'],
-                'kind': dep.get('kind', 'normal')
-            })
-        return dependencies
+        # Условный запрос: при 304 берём уже разобранный список из кеша
+        cached = _cache_get(url)
+        conditional_headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                conditional_headers['If-None-Match'] = etag
+            if last_modified:
+                conditional_headers['If-Modified-Since'] = last_modified
+        
+        status, headers, body = _http_get(url, conditional_headers)
+        if status == 304 and cached:
+            return tuple(Dep._make(dep) for dep in cached[2] if dep[2] in kinds)
+        if status != 200:
+            raise ConfigError(f"HTTP {status} для {url}")
+        data = json.loads(body)
+        
+        dependencies = tuple(
+            Dep(dep['crate_id'], dep['req'], dep.get('kind', 'normal'))
+            for dep in data.get('dependencies', [])
+        )
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag or last_modified:
+            _cache_put(url, (etag, last_modified, tuple(map(tuple, dependencies))))
+        return tuple(dep for dep in dependencies if dep.kind in kinds)
         
     except Exception as e:
         raise ConfigError(f"Ошибка получения зависимостей: {e}")
@@ -80,16 +332,12 @@ def load_test_dependencies_from_file(file_path):
     if not os.path.exists(file_path):
         return load_demo_dependencies()
     
-    graph = {}
     with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line and ':' in line:
-                package, deps_str = line.split(':', 1)
-                package = package.strip()
-                dependencies = [dep.strip() for dep in deps_str.split(',') if dep.strip()]
-                graph[package] = dependencies
-    return graph
+        text = f.read()
+    return {
+        match.group(1).strip(): [dep.strip() for dep in match.group(2).split(',') if dep.strip()]
+        for match in _TEST_GRAPH_LINE.finditer(text)
+    }
 
 def load_demo_dependencies():
     """Демонстрационный граф зависимостей"""
@@ -103,92 +351,204 @@ def load_demo_dependencies():
         'G': []
     }
 
-def build_dependency_graph_bfs(root_package, root_version, repository_url, max_depth, use_test_repo, test_repo_path):
-    """Построение графа зависимостей BFS с рекурсией"""
-    graph = defaultdict(list)
-    visited = {}
-    cycles_detected = []
-    depth_info = {}
+def find_cycles(graph, root, stop_on_first=False):
+    """Поиск циклов итеративным DFS с тремя цветами вершин
     
-    def bfs_recursive(package, version, current_depth):
-        if current_depth > max_depth:
-            return
-        
-        package_key = f"{package}@{version}"
-        
-        if package_key in visited:
-            cycles_detected.append(f"{package_key} -> ... -> {package_key}")
-            return
-        
-        visited[package_key] = current_depth
-        depth_info[package_key] = current_depth
-        
+    Ребро в вершину, которая ещё на стеке (серая), замыкает цикл. Полностью
+    обойдённые (чёрные) вершины пропускаются: повторный заход в общую
+    зависимость через другого родителя циклом не считается. При stop_on_first
+    поиск завершается на первом найденном цикле.
+    """
+    white, gray, black = 0, 1, 2
+    color = bytearray(len(graph.names))
+    cycles = set()   # номера пакетов, замыкающих цикл
+    
+    color[root] = gray
+    stack = [(root, iter(graph.adj[root]))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if color[child] == gray:
+                cycles.add(child)
+                if stop_on_first:
+                    return cycles
+            elif color[child] == white:
+                color[child] = gray
+                stack.append((child, iter(graph.adj[child])))
+                break
+        else:
+            color[node] = black
+            stack.pop()
+    return cycles
+
+def build_dependency_graph_bfs(root_package, root_version, repository_url, max_depth, use_test_repo, test_repo_path,
+                               stop_on_first_cycle=False, include_kinds=DEFAULT_DEPENDENCY_KINDS):
+    """Построение графа зависимостей BFS (итеративно, по уровням)"""
+    graph = DependencyGraph()
+    
+    # Тестовый граф неизменен в пределах одного запуска — читаем его один раз
+    test_graph = {}
+    if use_test_repo:
+        if test_repo_path and test_repo_path != "demo":
+            test_graph = load_test_dependencies_from_file(test_repo_path)
+        else:
+            test_graph = load_demo_dependencies()
+    
+    # Отрицательная глубина означает «ничего не раскрывать», как в исходной версии
+    depth_limit = max(0, min(max_depth, MAX_DEPTH_LIMIT) + 1)
+    
+    # Массивы по номерам выделяются сразу под ожидаемое число пакетов;
+    # для тестового графа известна точная верхняя граница
+    if use_test_repo:
+        capacity = 1 + len(test_graph) + sum(map(len, test_graph.values()))
+    else:
+        # 8 ** 5 уже больше PRESIZE_LIMIT, больший показатель не нужен
+        capacity = min(PRESIZE_LIMIT, ESTIMATED_FANOUT ** min(depth_limit, 5))
+    visited = bytearray(capacity)   # номер -> 1, если пакет уже раскрыт
+    depth_info = [None] * capacity  # номер -> уровень BFS (None, если не раскрыт)
+    
+    # Режим не меняется за время обхода, поэтому раскрытие уровня
+    # специализируется один раз, без ветвления на каждом пакете.
+    # Результат — зависимости для каждого пакета уровня (None при ошибке)
+    def expand_test_level(to_expand, _executor):
+        return [
+            [Dep(dep, '1.0', 'normal') for dep in test_graph.get(package, [])]
+            for package, _version, _node in to_expand
+        ]
+    
+    def fetch_live(item):
+        package, version, _node = item
         try:
-            if use_test_repo:
-                if test_repo_path and test_repo_path != "demo":
-                    dependencies_data = load_test_dependencies_from_file(test_repo_path)
-                else:
-                    dependencies_data = load_demo_dependencies()
+            return fetch_cargo_dependencies(package, version, repository_url, include_kinds)
+        except Exception as e:
+            print(f"Ошибка для {package}: {e}")
+            return None
+    
+    def expand_live_level(to_expand, executor):
+        return list(executor.map(fetch_live, to_expand))
+    
+    expand_level = expand_test_level if use_test_repo else expand_live_level
+    
+    # BFS по уровням: пакеты одного уровня запрашиваются параллельно. Выигрыш
+    # есть только для хостов вне REQUEST_INTERVALS; к crates.io запросы
+    # идут не чаще раза в секунду при любом числе потоков
+    root = graph.intern(f"{root_package}@{root_version}")
+    level = [(root_package, root_version, root)]
+    current_depth = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while level and current_depth != depth_limit:
+            # Если оценка оказалась мала, массивы растут не менее чем вдвое
+            if len(graph.names) > len(visited):
+                grow = max(len(graph.names), 2 * len(visited)) - len(visited)
+                visited.extend(bytes(grow))
+                depth_info.extend([None] * grow)
+            
+            to_expand = []
+            add_to_expand = to_expand.append
+            for item in level:
+                node = item[2]
+                if visited[node]:
+                    continue
                 
-                deps_list = dependencies_data.get(package, [])
-                dependencies = [{'name': dep, 'version_req': '1.0'} for dep in deps_list]
-            else:
-                dependencies = fetch_cargo_dependencies(package, version, repository_url)
+                visited[node] = 1
+                depth_info[node] = current_depth
+                add_to_expand(item)
             
-            for dep in dependencies:
-                dep_key = f"{dep['name']}@{dep['version_req']}"
-                graph[package_key].append(dep_key)
-                bfs_recursive(dep['name'], dep['version_req'], current_depth + 1)
+            # Горячий цикл по рёбрам. В live-режиме время уходит на HTTP, в
+            # тестовом — на создание строк и списков, а не на вычисления,
+            # поэтому поиск атрибутов вынесен в локальные переменные, а
+            # известные пакеты находятся без вызова intern
+            next_level = []
+            push_next = next_level.append
+            lookup = graph.id_of.get
+            intern = graph.intern
+            adj = graph.adj
+            for (_package, _version, node), dependencies in zip(to_expand, expand_level(to_expand, executor)):
+                if dependencies is None:
+                    continue
                 
-        except Exception as e:
-            print(f"Ошибка для {package}: {e}")
-        
-        visited.pop(package_key)
+                add_edge = adj[node].append
+                for dep_name, dep_version, _kind in dependencies:
+                    dep_key = f"{dep_name}@{dep_version}"
+                    dep = lookup(dep_key)
+                    if dep is None:
+                        dep = intern(dep_key)
+                    add_edge(dep)
+                    push_next((dep_name, dep_version, dep))
+            
+            level = next_level
+            current_depth += 1
+            
+            if stop_on_first_cycle and find_cycles(graph, root, stop_on_first=True):
+                break
+    
+    # Дубликаты рёбер убираются один раз после обхода, а не на каждом добавлении
+    graph.dedup_edges()
     
-    bfs_recursive(root_package, root_version, 0)
-    return graph, cycles_detected, depth_info
+    # Ровно одна запись на пакет: запас обрезается, а пакеты за пределами
+    # глубины (добавленные на последнем уровне) получают None
+    node_count = len(graph.names)
+    depth_info[node_count:] = [None] * (node_count - len(depth_info))
+    return graph, find_cycles(graph, root, stop_on_first_cycle), depth_info
+
+def format_cycle(package_key):
+    """Текстовое представление цикла, замкнутого на пакете"""
+    return f"{package_key} -> ... -> {package_key}"
 
 def print_dependency_tree(graph, cycles, depth_info, root_package, max_depth):
-    """Вывод дерева зависимостей"""
-    print(f"\nГраф для {root_package}")
-    print(f"Глубина: {max_depth if max_depth != float('inf') else 'не ограничена'}")
-    print(f"Пакетов: {len(graph)}")
+    """Вывод дерева зависимостей (одной записью в stdout)"""
+    names = graph.names
+    out = [
+        "",
+        f"Граф для {root_package}",
+        f"Глубина: {max_depth if max_depth != float('inf') else 'не ограничена'}",
+        f"Пакетов: {sum(1 for deps in graph.adj if deps)}",
+    ]
     
     packages_by_depth = defaultdict(list)
-    for package, depth in depth_info.items():
-        packages_by_depth[depth].append(package)
+    for node, depth in enumerate(depth_info):
+        if depth is not None:
+            packages_by_depth[depth].append(node)
     
     for depth in sorted(packages_by_depth.keys()):
-        print(f"\nУровень {depth}:")
-        for package in sorted(packages_by_depth[depth]):
-            deps = graph.get(package, [])
-            indent = "  " * depth
+        out.append(f"\nУровень {depth}:")
+        indent = "  " * depth
+        for node in sorted(packages_by_depth[depth], key=names.__getitem__):
+            deps = graph.adj[node]
             if deps:
-                print(f"{indent}{package} -> {', '.join(deps)}")
+                out.append(f"{indent}{names[node]} -> {', '.join(names[dep] for dep in deps)}")
             else:
-                print(f"{indent}{package}")
+                out.append(f"{indent}{names[node]}")
     
     if cycles:
-        print(f"\nЦиклы: {len(cycles)}")
-        for cycle in cycles:
-            print(f"  {cycle}")
+        out.append(f"\nЦиклы: {len(cycles)}")
+        for node in sorted(cycles):
+            out.append(f"  {format_cycle(names[node])}")
+    
+    out.append("")
+    sys.stdout.write("\n".join(out))
 
 def save_graph_to_file(graph, cycles, depth_info, root_package, max_depth, filename):
-    """Сохранение графа в файл"""
+    """Сохранение графа в файл (одной записью)"""
+    names = graph.names
+    lines = [
+        f"# Граф для {root_package}",
+        f"# Глубина: {max_depth if max_depth != float('inf') else 'не ограничена'}",
+        f"# Пакетов: {sum(1 for deps in graph.adj if deps)}",
+    ]
+    for node, dependencies in enumerate(graph.adj):
+        if dependencies:
+            lines.append(f"{names[node]}: {', '.join(names[dep] for dep in dependencies)}")
+    
+    if cycles:
+        lines.append("\n# Циклы:")
+        for node in sorted(cycles):
+            lines.append(f"# {format_cycle(names[node])}")
+    
+    lines.append("")
     try:
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"# Граф для {root_package}\n")
-            f.write(f"# Глубина: {max_depth if max_depth != float('inf') else 'не ограничена'}\n")
-            f.write(f"# Пакетов: {len(graph)}\n")
-            
-            for package, dependencies in graph.items():
-                if dependencies:
-                    f.write(f"{package}: {', '.join(dependencies)}\n")
-            
-            if cycles:
-                f.write("\n# Циклы:\n")
-                for cycle in cycles:
-                    f.write(f"# {cycle}\n")
+            f.write("\n".join(lines))
         
         print(f"Сохранено: {filename}")
     except Exception as e:
@@ -209,7 +569,9 @@ def main():
             config.get('repository_url', 'https://crates.io/api/v1/crates'),
             config['max_depth'],
             config['use_test_repository'],
-            config.get('test_repository_path', '')
+            config.get('test_repository_path', ''),
+            config.get('stop_on_first_cycle', False),
+            config.get('include_kinds', DEFAULT_DEPENDENCY_KINDS)
         )
         
         root_package_key = f"{config['package_name']}@{config.get('package_version', '1.0')}"